@@ -0,0 +1,157 @@
+import glob
+import json
+import os
+import threading
+import time
+
+# Store compartido en disco para servir lecturas desde varios workers.
+# Un único proceso (el "writer") publica; los "readers" sólo leen.
+#
+# - <path>.blocks.<generación>: un bloque por línea, sólo se añaden al final.
+#   Si la cadena se reemplaza (sync) se empieza una generación nueva.
+# - <path>: estado pequeño y mutable (longitud, generación, supply, balances,
+#   secuencias, stakes), reemplazado atómicamente en cada publicación.
+# Los bloques se escriben antes que el estado, así que un reader que lee el
+# estado siempre encuentra al menos "length" bloques completos.
+
+class ChainStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Lado writer
+        self._generation = None
+        self._published = 0
+        self._last_hash = None
+        # Lado reader
+        self._stamp = None
+        self._snapshot = None  # (estado, líneas de bloques en JSON)
+        self._offset = 0
+        self._chain_response = (None, None)
+
+    def blocks_path(self, generation):
+        return f"{self.path}.blocks.{generation}"
+
+    def publish(self, blockchain):
+        # Solo lo llama el proceso writer
+        chain = blockchain.chain
+        if (self._generation is None or len(chain) < self._published or
+                chain[self._published - 1].hash != self._last_hash):
+            # Primera publicación o cadena reemplazada: nueva generación con todos los bloques
+            self._generation = str(time.time_ns())
+            self._published = 0
+            self.append_blocks(chain)
+            self.write_state(blockchain, len(chain))
+            # Borrar las generaciones anteriores, incluidas las de writers previos a un reinicio
+            current = self.blocks_path(self._generation)
+            for path in glob.glob(glob.escape(self.path) + '.blocks.*'):
+                if path != current:
+                    os.remove(path)
+        else:
+            # Sólo se añaden los bloques nuevos: coste proporcional a lo publicado
+            self.append_blocks(chain[self._published:])
+            self.write_state(blockchain, len(chain))
+
+    def append_blocks(self, blocks):
+        if not blocks:
+            return  # p.ej. /add_stake: sólo cambia el estado
+        with open(self.blocks_path(self._generation), 'a') as f:
+            for block in blocks:
+                f.write(json.dumps(block.__dict__) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._published += len(blocks)
+        self._last_hash = blocks[-1].hash
+
+    def write_state(self, blockchain, length):
+        state = {
+            "length": length,
+            "generation": self._generation,
+            "total_supply": blockchain.total_supply,
+            "balances": blockchain.balances,
+            "sequences": blockchain.sequences,
+            "stakes": blockchain.stakes,
+        }
+        # Escritura atómica: los readers nunca ven un fichero a medias
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        # Recarga el estado sólo si el fichero ha cambiado, y de los bloques
+        # lee únicamente los añadidos desde la última vez
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    try:
+                        self.refresh(stamp)
+                    except FileNotFoundError:
+                        pass  # Generación reemplazada entre medias: se reintenta en la próxima lectura
+        return self._snapshot
+
+    def refresh(self, stamp):
+        # Se llama con self._lock tomado
+        with open(self.path, 'r') as f:
+            state = json.load(f)
+        lines, offset = [], 0
+        if self._snapshot is not None and self._snapshot[0]["generation"] == state["generation"]:
+            lines, offset = self._snapshot[1], self._offset
+        new_lines = []
+        if len(lines) < state["length"]:
+            with open(self.blocks_path(state["generation"]), 'rb') as f:
+                f.seek(offset)
+                while len(lines) + len(new_lines) < state["length"]:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        # Faltan bloques o el último está a medias (otro writer, fsync
+                        # parcial): el snapshot no está disponible hasta que se corrija
+                        self._snapshot = None
+                        self._offset = 0
+                        return
+                    new_lines.append(line.decode().rstrip('\n'))
+                offset = f.tell()
+        # Las líneas sólo crecen dentro de una generación: los snapshots anteriores
+        # siguen siendo válidos porque se limitan a su propio "length"
+        lines.extend(new_lines)
+        self._offset = offset
+        self._snapshot = (state, lines)
+        self._stamp = stamp
+
+    def chain_response(self):
+        snapshot = self.load()
+        if snapshot is None:
+            return None
+        state, lines = snapshot
+        key = (state["generation"], state["length"])
+        if self._chain_response[0] != key:
+            chain = ','.join(lines[:state["length"]])
+            self._chain_response = (key, f'{{"length": {state["length"]}, "chain": [{chain}]}}')
+        return self._chain_response[1]
+
+    def get_block(self, index):
+        snapshot = self.load()
+        if snapshot is None:
+            return None
+        state, lines = snapshot
+        if index < 0 or index >= state["length"]:
+            return None
+        return json.loads(lines[index])
+
+    def get_balance(self, address):
+        snapshot = self.load()
+        if snapshot is None:
+            return None
+        return snapshot[0]["balances"].get(address, 0)
+
+    def get_sequence(self, address):
+        snapshot = self.load()
+        if snapshot is None:
+            return None
+        return snapshot[0]["sequences"].get(address, 0)
@@ -0,0 +1,215 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import threading
+import subprocess
+import multiprocessing
+import requests
+from ecdsa import SigningKey, SECP256k1
+from wallet import public_key_to_address
+
+# Load test de lecturas: arranca un writer (v4.py, HQ_ROLE=writer) y un
+# gunicorn con N workers en modo reader, y mide peticiones/s contra /chain
+# y /balance para cada número de workers.
+#
+# Uso: python load_test.py [workers...]   (por defecto 1 2 4 8)
+# Requiere gunicorn instalado.
+#
+# python load_test.py --stress lanza muchos hilos contra los endpoints de
+# escritura de un nodo en memoria y comprueba que ninguna transacción se
+# pierde ni se incluye dos veces en la cadena, y que los replays se rechazan.
+
+WRITER_PORT = 8000
+READER_PORT = 8100
+DURATION = 10  # segundos por ronda
+CLIENTS = 16  # procesos cliente concurrentes
+STORE_PATH = 'load_test_state.json'
+CHAIN_BLOCKS = 200  # bloques minados antes de medir, para que /chain y /block trabajen de verdad
+TX_PER_BLOCK = 5
+STRESS_THREADS = 32
+STRESS_TX_PER_THREAD = 50
+
+
+def wait_for(url, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url).status_code == 200:
+                return True
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def build_chain(base_url):
+    # Mina CHAIN_BLOCKS bloques con TX_PER_BLOCK transacciones cada uno en el writer
+    session = requests.Session()
+    session.post(f'{base_url}/add_stake', json={"stakeholder": "load_test", "amount": 100})
+    signing_key = SigningKey.generate(curve=SECP256k1)
+    address = key_address(signing_key)
+    while session.get(f'{base_url}/balance/{address}').json()['balance'] < CHAIN_BLOCKS * TX_PER_BLOCK:
+        session.get(f'{base_url}/mine', params={"miner": address})
+    sequence = 0
+    for _ in range(CHAIN_BLOCKS):
+        for _ in range(TX_PER_BLOCK):
+            tx = signed_transaction(signing_key, "receiver", 1, sequence)
+            session.post(f'{base_url}/new_transaction', json=tx)
+            sequence += 1
+        session.get(f'{base_url}/mine')
+    return address, session.get(f'{base_url}/chain').json()['length']
+
+
+def client(base_url, duration, address, length, results):
+    session = requests.Session()
+    count = 0
+    errors = 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        paths = ['/chain', f'/balance/{address}', f'/block/{random.randrange(length)}']
+        try:
+            response = session.get(base_url + paths[count % len(paths)])
+        except requests.RequestException:
+            errors += 1
+            continue
+        if response.status_code == 200:
+            count += 1
+        else:
+            errors += 1
+    results.put((count, errors))
+
+
+def run_round(workers, env, address, length):
+    reader = subprocess.Popen(['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{READER_PORT}', 'v4:app'],
+                              env=dict(env, HQ_ROLE='reader'),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f'http://127.0.0.1:{READER_PORT}'
+        if not wait_for(base_url + '/chain'):
+            print(f"{workers} workers: readers did not start")
+            return
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(base_url, DURATION, address, length, results))
+                   for _ in range(CLIENTS)]
+        for p in clients:
+            p.start()
+        totals = [results.get() for _ in clients]
+        for p in clients:
+            p.join()
+        served = sum(t[0] for t in totals)
+        errors = sum(t[1] for t in totals)
+        print(f"{workers:>3} workers: {served / DURATION:10.1f} req/s  ({errors} errors)")
+    finally:
+        reader.terminate()
+        reader.wait()
+
+
+def key_address(signing_key):
+    return public_key_to_address(signing_key.get_verifying_key().to_string())
+
+
+def signed_transaction(signing_key, receiver, amount, sequence, sender=None):
+    # sender distinto de la dirección de la clave sólo para probar falsificaciones
+    data = {"sender": sender or key_address(signing_key), "receiver": receiver,
+            "amount": amount, "sequence": sequence}
+    signature = signing_key.sign(json.dumps(data, sort_keys=True).encode())
+    return dict(data,
+                sender_public_key=signing_key.get_verifying_key().to_string().hex(),
+                signature=signature.hex())
+
+
+def stress():
+    import v4
+    v4.app.testing = True
+    app_client = v4.app.test_client()
+    app_client.post('/add_stake', json={"stakeholder": "stress", "amount": 100})
+
+    # Una clave por remitente; fondos con recompensas de bloques minados a su dirección
+    signing_keys = [SigningKey.generate(curve=SECP256k1) for _ in range(STRESS_THREADS)]
+    for signing_key in signing_keys:
+        address = key_address(signing_key)
+        while app_client.get(f'/balance/{address}').get_json()['balance'] < STRESS_TX_PER_THREAD:
+            app_client.get(f'/mine?miner={address}')
+
+    failures = []
+    replays = []
+    forgeries = []
+
+    def sender(thread_id):
+        local_client = v4.app.test_client()
+        signing_key = signing_keys[thread_id]
+        victim = key_address(signing_keys[(thread_id + 1) % STRESS_THREADS])
+        for i in range(STRESS_TX_PER_THREAD):
+            tx = signed_transaction(signing_key, "receiver", 1, i)
+            if local_client.post('/new_transaction', json=tx).status_code != 201:
+                failures.append((thread_id, i))
+            if local_client.post('/new_transaction', json=tx).status_code == 201:
+                replays.append((thread_id, i))
+            # Gastar desde la dirección de otro firmando con la clave propia
+            forged = signed_transaction(signing_key, "receiver", 1, i, sender=victim)
+            if local_client.post('/new_transaction', json=forged).status_code == 201:
+                forgeries.append((thread_id, i))
+
+    def miner(stop):
+        local_client = v4.app.test_client()
+        while not stop.is_set():
+            local_client.get('/mine')
+
+    stop = threading.Event()
+    miners = [threading.Thread(target=miner, args=(stop,)) for _ in range(4)]
+    senders = [threading.Thread(target=sender, args=(t,)) for t in range(STRESS_THREADS)]
+    start = time.time()
+    for t in miners + senders:
+        t.start()
+    for t in senders:
+        t.join()
+    stop.set()
+    for t in miners:
+        t.join()
+    while v4.blockchain.unconfirmed_transactions:
+        app_client.get('/mine')
+    elapsed = time.time() - start
+
+    expected = STRESS_THREADS * STRESS_TX_PER_THREAD - len(failures)
+    seen = {}
+    for block in v4.blockchain.chain:
+        for tx in block.transactions:
+            seen[tx['signature']] = seen.get(tx['signature'], 0) + 1
+    duplicated = sum(1 for count in seen.values() if count > 1)
+    print(f"{expected} transactions accepted, {len(seen)} in chain, "
+          f"{duplicated} duplicated, {len(failures)} rejected, {len(replays)} replays accepted, "
+          f"{len(forgeries)} forgeries accepted, "
+          f"{len(v4.blockchain.chain) - 1} blocks in {elapsed:.1f}s")
+    return len(seen) == expected and duplicated == 0 and not failures and not replays and not forgeries
+
+
+def main():
+    if sys.argv[1:] == ['--stress']:
+        sys.exit(0 if stress() else 1)
+    worker_counts = [int(w) for w in sys.argv[1:]] or [1, 2, 4, 8]
+    env = dict(os.environ,
+               HQ_STORE=STORE_PATH,
+               HQ_PORT=str(WRITER_PORT),
+               HQ_WRITER_URL=f'http://127.0.0.1:{WRITER_PORT}')
+    writer = subprocess.Popen([sys.executable, 'v4.py'], env=dict(env, HQ_ROLE='writer'),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for(f'http://127.0.0.1:{WRITER_PORT}/chain'):
+            print("Writer did not start")
+            return
+        address, length = build_chain(f'http://127.0.0.1:{WRITER_PORT}')
+        print(f"Chain of {length} blocks built")
+        for workers in worker_counts:
+            run_round(workers, env, address, length)
+    finally:
+        writer.terminate()
+        writer.wait()
+        for path in glob.glob(STORE_PATH + '*'):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
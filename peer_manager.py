@@ -0,0 +1,150 @@
+import json
+import os
+import time
+import heapq
+import random
+import threading
+
+# Tabla de peers persistente con métricas de salud.
+# Los cambios se añaden a un log de líneas JSON; cuando el log crece mucho
+# respecto al número de peers vivos se compacta con un reemplazo atómico.
+
+class PeerManager:
+    rtt_alpha = 0.3  # Peso de la última medida en la media móvil del RTT
+    base_backoff = 5  # Segundos de espera tras el primer fallo
+    max_backoff = 600
+    max_failures = 8  # Fallos seguidos antes de expulsar al peer
+    compact_ratio = 4  # Compactar cuando el log tenga N veces más líneas que peers
+    explore_slots = 2  # Huecos reservados a peers aún sin RTT medido
+
+    def __init__(self, log_file, legacy_file=None):
+        self.log_file = log_file
+        self.peers = {}
+        self.log_lines = 0
+        self.lock = threading.Lock()
+        self.load(legacy_file)
+
+    def load(self, legacy_file):
+        if os.path.exists(self.log_file):
+            damaged = False
+            with open(self.log_file, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        damaged = True  # Línea a medias tras un corte
+                        continue
+                    if not isinstance(entry, dict) or 'op' not in entry or 'address' not in entry:
+                        damaged = True
+                        continue
+                    self.log_lines += 1
+                    if entry['op'] == 'remove':
+                        self.peers.pop(entry['address'], None)
+                    elif isinstance(entry.get('peer'), dict):
+                        self.peers[entry['address']] = entry['peer']
+            if damaged:
+                # Reescribir el log: si no, lo siguiente que se añada quedaría pegado
+                # a la línea rota y se perdería en la próxima carga
+                self.compact()
+        elif legacy_file and os.path.exists(legacy_file):
+            # Migrar el antiguo peers.json
+            with open(legacy_file, 'r') as f:
+                for address in json.load(f):
+                    self.peers[address] = self.new_peer()
+            self.compact()
+
+    def new_peer(self):
+        return {"rtt": None, "failures": 0, "last_seen": None, "retry_at": 0}
+
+    def append(self, op, address, peer=None):
+        # Se llama con self.lock tomado
+        entry = {"op": op, "address": address}
+        if peer is not None:
+            entry["peer"] = peer
+        with open(self.log_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.log_lines += 1
+        if self.log_lines > self.compact_ratio * max(len(self.peers), 16):
+            self.compact()
+
+    def compact(self):
+        # Temporal por proceso: varios procesos no deben pisarse el mismo fichero
+        tmp_file = f"{self.log_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as f:
+            for address, peer in self.peers.items():
+                f.write(json.dumps({"op": "add", "address": address, "peer": peer}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.log_file)
+        self.log_lines = len(self.peers)
+
+    def add(self, address):
+        with self.lock:
+            if address in self.peers:
+                return False
+            self.peers[address] = self.new_peer()
+            self.append('add', address, self.peers[address])
+            return True
+
+    def update(self, addresses):
+        for address in addresses:
+            self.add(address)
+
+    def remove(self, address):
+        with self.lock:
+            if self.peers.pop(address, None) is not None:
+                self.append('remove', address)
+
+    def record_success(self, address, rtt):
+        with self.lock:
+            peer = self.peers.get(address)
+            if peer is None:
+                return
+            if peer["rtt"] is None:
+                peer["rtt"] = rtt
+            else:
+                peer["rtt"] = (1 - self.rtt_alpha) * peer["rtt"] + self.rtt_alpha * rtt
+            peer["failures"] = 0
+            peer["retry_at"] = 0
+            peer["last_seen"] = time.time()
+            self.append('update', address, peer)
+
+    def record_failure(self, address):
+        with self.lock:
+            peer = self.peers.get(address)
+            if peer is None:
+                return
+            peer["failures"] += 1
+            if peer["failures"] >= self.max_failures:
+                # Peer muerto: se expulsa de la tabla
+                del self.peers[address]
+                self.append('remove', address)
+                return
+            backoff = min(self.base_backoff * 2 ** (peer["failures"] - 1), self.max_backoff)
+            peer["retry_at"] = time.time() + backoff
+            self.append('update', address, peer)
+
+    def best_peers(self, count=None):
+        # Peers sanos (fuera de backoff) ordenados por RTT. Con count se reservan
+        # explore_slots huecos a peers sin medir, elegidos al azar, para que lleguen a
+        # medirse y se descubran peers nuevos más rápidos
+        now = time.time()
+        with self.lock:
+            measured = [(peer["rtt"], address) for address, peer in self.peers.items()
+                        if peer["retry_at"] <= now and peer["rtt"] is not None]
+            unmeasured = [address for address, peer in self.peers.items()
+                          if peer["retry_at"] <= now and peer["rtt"] is None]
+        if count is None:
+            return [address for _, address in sorted(measured)] + unmeasured
+        explore = min(len(unmeasured), self.explore_slots, count // 2 if measured else count)
+        fastest = [address for _, address in heapq.nsmallest(count - explore, measured)]
+        # Si no hay bastantes peers medidos, el resto de huecos también va a peers sin medir
+        explore = min(len(unmeasured), count - len(fastest))
+        return fastest + random.sample(unmeasured, explore)
+
+    def addresses(self):
+        with self.lock:
+            return list(self.peers)
+
+    def __len__(self):
+        return len(self.peers)
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+# Profiler por muestreo sin dependencias externas.
+# Mientras está activo (durante una ventana de tiempo) muestrea periódicamente la pila
+# de los hilos que están dentro de un scope ("mine", "sync", "intake"...) y al cerrar
+# cada perfil escribe:
+#   <scope>-<fecha>.collapsed  pilas colapsadas, listas para flamegraph.pl / speedscope
+#   <scope>-<fecha>.txt        tabla por función con muestras propias y acumuladas
+# Los scopes batched agrupan batch_size llamadas en un solo perfil (p.ej. la entrada
+# de transacciones, donde cada llamada es demasiado corta para muestrearla sola).
+
+class Profiler:
+    def __init__(self, output_dir='profiles'):
+        self.output_dir = output_dir
+        self.scopes = set()
+        self.until = 0
+        self.interval = 0.005
+        self.batch_size = 100
+        self.active = {}  # id de hilo -> Counter de pilas de la llamada en curso
+        self.batches = {}  # scope -> [Counter de pilas, llamadas, tiempo total]
+        self.written = []
+        self.labels = {}  # código -> etiqueta "fichero:línea:función"
+        self.root = os.path.dirname(os.path.abspath(__file__))
+        self.lock = threading.Lock()
+        self.sampler = None
+
+    def enable(self, scopes, window, interval=None, batch_size=None):
+        with self.lock:
+            self.scopes = set(scopes)
+            self.until = time.time() + window
+            if interval:
+                self.interval = interval
+            if batch_size:
+                self.batch_size = batch_size
+            if self.sampler is None or not self.sampler.is_alive():
+                self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+                self.sampler.start()
+
+    def disable(self):
+        with self.lock:
+            self.until = 0
+            self.flush()
+
+    def enabled(self, scope):
+        return scope in self.scopes and time.time() < self.until
+
+    def status(self):
+        return {"scopes": sorted(self.scopes) if time.time() < self.until else [],
+                "remaining": max(0, self.until - time.time()),
+                "interval_ms": self.interval * 1000,
+                "batch_size": self.batch_size,
+                "profiles": list(self.written)}
+
+    @contextmanager
+    def scope(self, name, batched=False):
+        if not self.enabled(name):
+            yield
+            return
+        thread_id = threading.get_ident()
+        samples = Counter()
+        with self.lock:
+            self.active[thread_id] = samples
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            with self.lock:
+                del self.active[thread_id]
+                batch = self.batches.setdefault(name, [Counter(), 0, 0])
+                batch[0].update(samples)
+                batch[1] += 1
+                batch[2] += elapsed
+                if batch[1] >= (self.batch_size if batched else 1):
+                    self.write(name, *self.batches.pop(name))
+
+    def sample_loop(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, samples in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[self.collapse(frame)] += 1
+                if time.time() >= self.until and not self.active:
+                    # Fin de la ventana: se escriben los batches incompletos
+                    self.flush()
+                    self.sampler = None
+                    return
+
+    def collapse(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self.label(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def label(self, code):
+        # Ruta relativa al proyecto (o completa fuera de él) y primera línea: dos funciones
+        # con el mismo nombre en ficheros homónimos (p.ej. __init__.py) no se mezclan
+        label = self.labels.get(code)
+        if label is None:
+            path = os.path.relpath(os.path.abspath(code.co_filename), self.root)
+            if path.startswith('..'):
+                path = code.co_filename
+            label = self.labels[code] = f"{path}:{code.co_firstlineno}:{code.co_name}"
+        return label
+
+    def flush(self):
+        # Se llama con self.lock tomado
+        for name, batch in list(self.batches.items()):
+            self.write(name, *batch)
+        self.batches = {}
+
+    def write(self, name, samples, calls, elapsed):
+        # Se llama con self.lock tomado
+        if not samples:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{len(self.written)}")
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        total = sum(samples.values())
+        own = Counter()
+        cumulative = Counter()
+        for stack, count in samples.items():
+            functions = stack.split(';')
+            own[functions[-1]] += count
+            for function in set(functions):  # Recursión: una vez por pila
+                cumulative[function] += count
+        # El tiempo se reparte según la proporción de muestras: el intervalo real depende
+        # del GIL y puede ser mayor que self.interval
+        wall_ms = elapsed * 1000
+        with open(base + '.txt', 'w') as f:
+            f.write(f"scope: {name}  calls: {calls}  wall: {elapsed * 1000:.1f} ms  "
+                    f"samples: {total}  interval: {self.interval * 1000:.1f} ms\n\n")
+            f.write(f"{'cumulative':>12} {'%':>6} {'self':>10} {'%':>6}  function\n")
+            for function, count in cumulative.most_common():
+                f.write(f"{wall_ms * count / total:10.1f}ms {100 * count / total:6.1f} "
+                        f"{wall_ms * own[function] / total:8.1f}ms {100 * own[function] / total:6.1f}  "
+                        f"{function}\n")
+        self.written.append(base)
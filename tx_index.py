@@ -0,0 +1,53 @@
+from hashlib import sha256
+import json
+
+# Índice de transacciones confirmadas: un filtro de Bloom delante de un set exacto.
+# La mayoría de transacciones nuevas se descartan como "no vistas" sólo con el filtro;
+# el set resuelve los falsos positivos.
+
+def compute_txid(transaction):
+    # Sólo los datos firmados: la firma ECDSA no es determinista y no identifica la transacción
+    tx_string = json.dumps(transaction['data'], sort_keys=True)
+    return sha256(tx_string.encode()).hexdigest()
+
+class BloomFilter:
+    def __init__(self, capacity, hashes=7):
+        self.size = capacity * 10  # ~10 bits por elemento, ~1% de falsos positivos con 7 hashes
+        self.hashes = hashes
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, txid):
+        # El txid ya es un sha256: se reutilizan trozos de 4 bytes como hashes independientes
+        digest = bytes.fromhex(txid)
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[4*i:4*i + 4], 'big') % self.size
+
+    def add(self, txid):
+        for pos in self.positions(txid):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, txid):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(txid))
+
+class TxIndex:
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.bloom = BloomFilter(capacity)
+        self.txids = set()
+
+    def add(self, txid):
+        self.txids.add(txid)
+        if len(self.txids) > self.capacity:
+            # Filtro lleno: se reconstruye con el doble de capacidad
+            self.capacity *= 2
+            self.bloom = BloomFilter(self.capacity)
+            for known in self.txids:
+                self.bloom.add(known)
+        else:
+            self.bloom.add(txid)
+
+    def __contains__(self, txid):
+        return txid in self.bloom and txid in self.txids
+
+    def __len__(self):
+        return len(self.txids)
@@ -1,10 +1,31 @@
 from hashlib import sha256
 import time
 import json
+import hmac
+import math
 import os
 import random
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
-from ecdsa import SigningKey, VerifyingKey, SECP256k1
+from ecdsa import SigningKey, VerifyingKey, SECP256k1, BadSignatureError
+from ecdsa.errors import MalformedPointError
+from chain_store import ChainStore
+from peer_manager import PeerManager
+from profiler import Profiler
+from tx_index import TxIndex, compute_txid
+from wallet import public_key_to_address
+
+def valid_transaction_data(tx):
+    # Forma de una transacción (importe y secuencia se validan en valid_transaction)
+    if not isinstance(tx, dict) or not isinstance(tx.get("data"), dict):
+        return False
+    data = tx["data"]
+    sequence = data.get("sequence")
+    return (isinstance(data.get("sender"), str) and isinstance(data.get("receiver"), str) and
+            "amount" in data and isinstance(sequence, int) and not isinstance(sequence, bool) and
+            isinstance(tx.get("sender_public_key"), str) and isinstance(tx.get("signature"), str))
 
 class Block:
     def __init__(self, index, transactions, timestamp, previous_hash):
@@ -14,6 +35,7 @@ class Block:
         self.previous_hash = previous_hash
         self.nonce = 0
         self.stakeholder = None  # Para PoS
+        self.miner = None  # Dirección que recibe la recompensa en PoW
 
     def compute_hash(self):
         block_string = json.dumps(self.__dict__, sort_keys=True)
@@ -30,12 +52,23 @@ class Blockchain:
         self.total_supply = 0  # Total de monedas emitidas
         self.stakes = {}  # Diccionario de participaciones para PoS
         self.balances = {}  # Diccionario de balances para las direcciones de wallets
+        self.sequences = {}  # Siguiente número de secuencia confirmado por dirección
+        self.confirmed = TxIndex()  # txids ya incluidos en la cadena
+        # Lo pendiente en el mempool, para validar descubiertos y secuencias al admitir
+        self.pending_spent = {}
+        self.pending_sequences = {}
+        # Locks separados para cadena, mempool y estado (stakes, balances, supply).
+        # chain, stakes y balances se reemplazan enteros (copy-on-write), así que
+        # las lecturas no necesitan lock: siempre ven una versión consistente.
+        self.chain_lock = threading.Lock()
+        self.mempool_lock = threading.Lock()
+        self.state_lock = threading.Lock()
         self.create_genesis_block()
 
     def create_genesis_block(self):
         genesis_block = Block(0, [], time.time(), '0'*64)
         genesis_block.hash = genesis_block.compute_hash()
-        self.chain.append(genesis_block)
+        self.chain = [genesis_block]
 
     @property
     def last_block(self):
@@ -43,22 +76,95 @@ class Blockchain:
 
     def add_new_transaction(self, transaction):
         # Verificar que la transacción esté firmada correctamente
-        if self.verify_transaction(transaction):
-            self.unconfirmed_transactions.append(transaction)
-        else:
+        if not self.verify_transaction(transaction):
             return False
+        with self.mempool_lock:
+            # Rechaza replays (ya confirmada o secuencia repetida) y descubiertos,
+            # contando lo que el remitente ya tiene pendiente en el mempool
+            if not self.valid_transaction(transaction, self.balances, self.sequences, self.confirmed,
+                                          self.pending_spent, self.pending_sequences):
+                return False
+            self.unconfirmed_transactions.append(transaction)
+            self.track_pending(transaction)
+        return True
 
-    def mine(self):
-        if not self.unconfirmed_transactions:
+    def valid_transaction(self, transaction, balances, sequences, confirmed,
+                          pending_spent=None, pending_sequences=None):
+        # Con pending_* se descuenta lo que el remitente ya tiene en el mempool.
+        # La forma se comprueba aquí para que una transacción mal formada no pueda
+        # entrar ni quedarse en el mempool (rebuild_pending y apply_block pasan por aquí)
+        if not valid_transaction_data(transaction):
+            return False
+        data = transaction['data']
+        sender = data['sender']
+        amount = data['amount']
+        balance = balances.get(sender, 0) - (pending_spent or {}).get(sender, 0)
+        sequence = (pending_sequences or {}).get(sender, sequences.get(sender, 0))
+        # NaN e infinito pasarían las comparaciones; bool es subclase de int
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount):
             return False
+        if amount <= 0 or amount > balance:
+            return False
+        if data['sequence'] != sequence:
+            return False
+        return compute_txid(transaction) not in confirmed
+
+    def track_pending(self, transaction):
+        # Se llama con mempool_lock tomado
+        data = transaction['data']
+        self.pending_sequences[data['sender']] = data['sequence'] + 1
+        self.pending_spent[data['sender']] = self.pending_spent.get(data['sender'], 0) + data['amount']
+
+    def rebuild_pending(self):
+        # Se llama con mempool_lock tomado tras cambiar la cadena: descarta lo que ya
+        # está confirmado o ha dejado de ser válido y recalcula lo pendiente
+        transactions = self.unconfirmed_transactions
+        self.unconfirmed_transactions = []
+        self.pending_spent = {}
+        self.pending_sequences = {}
+        for tx in transactions:
+            if self.valid_transaction(tx, self.balances, self.sequences, self.confirmed,
+                                      self.pending_spent, self.pending_sequences):
+                self.unconfirmed_transactions.append(tx)
+                self.track_pending(tx)
+
+    def mine(self, miner=None):
+        # Sin transacciones sólo se mina si hay a quién pagar la recompensa
+        if not self.unconfirmed_transactions and miner is None:
+            return False
+
+        # Un solo minero a la vez sobre el último bloque
+        with self.chain_lock:
+            # Snapshot-and-swap: las transacciones que lleguen mientras minamos
+            # van a la nueva lista y no se pierden al terminar
+            with self.mempool_lock:
+                pending = self.unconfirmed_transactions
+                self.unconfirmed_transactions = []
+            if not pending and miner is None:
+                return False
 
+            new_block = False
+            try:
+                new_block = self.mine_block(pending, miner)
+            finally:
+                if not new_block:
+                    # Si falla (o lanza una excepción) devolver las transacciones al mempool,
+                    # delante de las nuevas; rebuild_pending descarta las que ya no son válidas
+                    with self.mempool_lock:
+                        self.unconfirmed_transactions = pending + self.unconfirmed_transactions
+                        self.rebuild_pending()
+            return new_block
+
+    def mine_block(self, transactions, miner=None):
         last_block = self.last_block
-        if last_block.index % 2 == 0:
+        # El tipo de prueba depende del índice del bloque nuevo, igual que en is_valid_proof
+        if (last_block.index + 1) % 2 == 0:
             # Use PoW
             new_block = Block(index=last_block.index + 1,
-                              transactions=self.unconfirmed_transactions,
+                              transactions=transactions,
                               timestamp=time.time(),
                               previous_hash=last_block.hash)
+            new_block.miner = miner
             proof = self.proof_of_work(new_block)
         else:
             # Use PoS
@@ -66,19 +172,87 @@ class Blockchain:
             if not stakeholder:
                 return False
             new_block = Block(index=last_block.index + 1,
-                              transactions=self.unconfirmed_transactions,
+                              transactions=transactions,
                               timestamp=time.time(),
                               previous_hash=last_block.hash)
             new_block.stakeholder = stakeholder
+            new_block.miner = miner
             proof = self.proof_of_stake(new_block)
 
-        if self.add_block(new_block, proof):
-            self.total_supply += Blockchain.reward  # Incrementa el suministro total
-            self.update_balances(new_block)
-            self.unconfirmed_transactions = []
-            return new_block.index
+        if self.commit_block(new_block, proof):
+            return new_block
         return False
 
+    def commit_block(self, block, proof):
+        # Se llama con chain_lock tomado. Valida las transacciones contra el estado
+        # confirmado antes de añadir el bloque y luego actualiza el estado
+        balances = dict(self.balances)
+        sequences = dict(self.sequences)
+        if not self.apply_block(balances, sequences, self.confirmed, block):
+            return False
+        if not self.add_block(block, proof):
+            return False
+        with self.mempool_lock:
+            with self.state_lock:
+                self.total_supply += Blockchain.reward  # Incrementa el suministro total
+                self.balances = balances
+                self.sequences = sequences
+                for tx in block.transactions:
+                    self.confirmed.add(compute_txid(tx))
+            self.rebuild_pending()
+        return True
+
+    def add_remote_block(self, block, proof):
+        # Bloque minado por otro nodo: sus transacciones no han pasado por el mempool,
+        # así que se verifican las firmas (fuera del lock, es lo más caro)
+        if not self.verify_block_signatures(block):
+            return False
+        with self.chain_lock:
+            return self.commit_block(block, proof)
+
+    def verify_block_signatures(self, block):
+        return all(self.verify_transaction(tx) for tx in block.transactions)
+
+    def replace_chain(self, chain):
+        # Adopta una cadena más larga (ya validada) recalculando balances y suministro;
+        # se rechaza si algún bloque contiene firmas inválidas, replays o descubiertos
+        if len(chain) <= len(self.chain):
+            return False
+        if not all(self.verify_block_signatures(block) for block in chain[1:]):
+            return False
+        with self.chain_lock:
+            if len(chain) <= len(self.chain):
+                return False
+            balances = {}
+            sequences = {}
+            confirmed = TxIndex()
+            for block in chain[1:]:
+                if not self.apply_block(balances, sequences, confirmed, block):
+                    return False
+                for tx in block.transactions:
+                    confirmed.add(compute_txid(tx))
+            with self.mempool_lock:
+                with self.state_lock:
+                    self.chain = chain
+                    self.balances = balances
+                    self.sequences = sequences
+                    self.confirmed = confirmed
+                    self.total_supply = Blockchain.reward * (len(chain) - 1)
+                self.rebuild_pending()
+            return True
+
+    def check_chain_validity(self, chain):
+        for previous_block, block in zip(chain, chain[1:]):
+            block_hash = block.hash
+            delattr(block, 'hash')  # compute_hash se calcula sin el propio hash
+            valid = (block.index == previous_block.index + 1 and
+                     block.previous_hash == previous_block.hash and
+                     self.is_valid_proof(block, block_hash))
+            block.hash = block_hash
+            if not valid:
+                return False
+        return True
+
     def proof_of_work(self, block):
         block.nonce = 0
         computed_hash = block.compute_hash()
@@ -91,6 +265,9 @@ class Blockchain:
         return block.compute_hash()
 
     def add_block(self, block, proof):
+        # El índice decide PoW/PoS y la posición en la cadena: debe ser el siguiente
+        if block.index != self.last_block.index + 1:
+            return False
         previous_hash = self.last_block.hash
         if previous_hash != block.previous_hash:
             return False
@@ -99,7 +276,7 @@ class Blockchain:
         if self.total_supply + Blockchain.reward > Blockchain.max_supply:
             return False  # No permite superar el suministro máximo
         block.hash = proof
-        self.chain.append(block)
+        self.chain = self.chain + [block]
         return True
 
     def is_valid_proof(self, block, block_hash):
@@ -111,42 +288,61 @@ class Blockchain:
             return block_hash == block.compute_hash() and block.stakeholder is not None
 
     def select_stakeholder(self):
-        if not self.stakes:
+        stakes = self.stakes
+        if not stakes:
             return None
-        total_stake = sum(self.stakes.values())
+        total_stake = sum(stakes.values())
         selection = random.uniform(0, total_stake)
         current = 0
-        for stakeholder, stake in self.stakes.items():
+        for stakeholder, stake in stakes.items():
             current += stake
             if current > selection:
                 return stakeholder
         return None
 
     def add_stake(self, stakeholder, amount):
-        if stakeholder in self.stakes:
-            self.stakes[stakeholder] += amount
-        else:
-            self.stakes[stakeholder] = amount
-
-    def update_balances(self, block):
+        with self.state_lock:
+            stakes = dict(self.stakes)
+            stakes[stakeholder] = stakes.get(stakeholder, 0) + amount
+            self.stakes = stakes
+
+    def apply_block(self, balances, sequences, confirmed, block):
+        # Aplica el bloque sobre balances y sequences; False si hay replays o descubiertos.
+        # Las secuencias estrictamente consecutivas detectan también duplicados dentro del bloque
         for tx in block.transactions:
-            sender = tx['sender']
-            receiver = tx['receiver']
-            amount = tx['amount']
-            self.balances[sender] -= amount
-            self.balances[receiver] = self.balances.get(receiver, 0) + amount
+            if not self.valid_transaction(tx, balances, sequences, confirmed):
+                return False
+            sender = tx['data']['sender']
+            receiver = tx['data']['receiver']
+            amount = tx['data']['amount']
+            balances[sender] = balances.get(sender, 0) - amount
+            balances[receiver] = balances.get(receiver, 0) + amount
+            sequences[sender] = tx['data']['sequence'] + 1
         # Recompensa de minado
         if block.index % 2 == 0:
-            miner = tx['sender']
-            self.balances[miner] = self.balances.get(miner, 0) + self.reward
+            miner = block.miner
+            if miner is None and block.transactions:
+                miner = block.transactions[-1]['data']['sender']
+            if miner is not None:
+                balances[miner] = balances.get(miner, 0) + self.reward
+        return True
 
     def verify_transaction(self, transaction):
         sender_public_key = transaction['sender_public_key']
-        signature = bytes.fromhex(transaction['signature'])
         tx_data = json.dumps(transaction['data'], sort_keys=True).encode()
 
-        verifying_key = VerifyingKey.from_string(bytes.fromhex(sender_public_key), curve=SECP256k1)
-        return verifying_key.verify(signature, tx_data)
+        try:
+            public_key_bytes = bytes.fromhex(sender_public_key)
+            # El remitente debe ser la dirección de la clave que firma; si no, cualquiera
+            # podría gastar el saldo de otra dirección firmando con su propia clave
+            if transaction['data']['sender'] != public_key_to_address(public_key_bytes):
+                return False
+            signature = bytes.fromhex(transaction['signature'])
+            verifying_key = VerifyingKey.from_string(public_key_bytes, curve=SECP256k1)
+            return verifying_key.verify(signature, tx_data)
+        except (BadSignatureError, MalformedPointError, ValueError):
+            # MalformedPointError (clave pública mal formada) deriva de AssertionError
+            return False
 
 # Flask web application
 app = Flask(__name__)
@@ -154,52 +350,204 @@ app = Flask(__name__)
 # Initialize a Blockchain object
 blockchain = Blockchain()
 
-# Path to store peers
-peers_file = 'peers.json'
+# Deployment role: "standalone" (default), "writer" or "reader".
+# The writer owns the blockchain and publishes snapshots to the store;
+# readers (e.g. gunicorn -w N v4:app) serve reads from the store and
+# forward writes to the writer.
+role = os.environ.get('HQ_ROLE', 'standalone')
+store = ChainStore(os.environ.get('HQ_STORE', 'chain_state.json'))
+writer_url = os.environ.get('HQ_WRITER_URL', 'http://127.0.0.1:8000')
+writer_timeout = float(os.environ.get('HQ_WRITER_TIMEOUT', 30))  # /mine and /sync can take a while
+
+if role == 'writer':
+    store.publish(blockchain)
+
+def forward_to_writer(path):
+    try:
+        response = requests.request(request.method, f"{writer_url}{path}",
+                                    params=request.args,
+                                    data=request.get_data(),
+                                    headers={'Content-Type': "application/json",
+                                             'X-Admin-Token': request.headers.get('X-Admin-Token', '')},
+                                    timeout=writer_timeout)
+    except (requests.ConnectionError, requests.Timeout):
+        return "Writer not available", 503
+    except requests.RequestException:
+        return "Bad response from writer", 502
+    headers = {}
+    if 'Content-Type' in response.headers:
+        headers['Content-Type'] = response.headers['Content-Type']
+    return response.content, response.status_code, headers
+
+# Peer table, persisted as an append/compact log (imports the old peers.json once).
+# Only the process that owns the chain keeps it; readers forward every peer endpoint
+peers = None
+if role != 'reader':
+    peers = PeerManager(os.environ.get('HQ_PEERS_LOG', 'peers.log'), legacy_file='peers.json')
+sync_peers = 8  # Fastest healthy peers queried on each sync
+broadcast_fanout = 8  # Fastest healthy peers a new block is announced to
+peer_timeout = 5
+
+# Sampling profiler for the "mine", "sync" and "intake" scopes. Enable it at startup with
+# HQ_PROFILE=mine,sync,intake (window in HQ_PROFILE_WINDOW seconds) or via /admin/profile
+profiler = Profiler(os.environ.get('HQ_PROFILE_DIR', 'profiles'))
+if os.environ.get('HQ_PROFILE'):
+    profiler.enable(os.environ['HQ_PROFILE'].split(','),
+                    window=float(os.environ.get('HQ_PROFILE_WINDOW', 60)),
+                    interval=float(os.environ.get('HQ_PROFILE_INTERVAL_MS', 5)) / 1000,
+                    batch_size=int(os.environ.get('HQ_PROFILE_BATCH', 100)))
+
+profile_scopes = ('mine', 'sync', 'intake')
+# Admin endpoints require this token when it is set; without one they are only
+# served to local requests (behind a local reverse proxy every request looks local)
+admin_token = os.environ.get('HQ_ADMIN_TOKEN')
+
+def is_admin_request():
+    if admin_token:
+        return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def positive_number(value):
+    return (not isinstance(value, bool) and isinstance(value, (int, float)) and
+            math.isfinite(value) and value > 0)
+
+def valid_block_data(block_data):
+    # Shape of a block received from a peer, before building a Block from it
+    if not isinstance(block_data, dict):
+        return False
+    return (isinstance(block_data.get("index"), int) and
+            isinstance(block_data.get("timestamp"), (int, float)) and
+            isinstance(block_data.get("previous_hash"), str) and
+            isinstance(block_data.get("nonce"), int) and
+            isinstance(block_data.get("hash"), str) and
+            isinstance(block_data.get("miner"), (str, type(None))) and
+            isinstance(block_data.get("stakeholder"), (str, type(None))) and
+            isinstance(block_data.get("transactions"), list) and
+            all(valid_transaction_data(tx) for tx in block_data["transactions"]))
+
+def create_chain_from_dump(chain_dump):
+    chain = []
+    for block_data in chain_dump:
+        block = Block(block_data["index"],
+                      block_data["transactions"],
+                      block_data["timestamp"],
+                      block_data["previous_hash"])
+        block.nonce = block_data["nonce"]
+        block.stakeholder = block_data.get("stakeholder")
+        block.miner = block_data.get("miner")
+        block.hash = block_data["hash"]
+        chain.append(block)
+    return chain
+
+def fetch_chain(peer):
+    start = time.time()
+    try:
+        response = requests.get(f"{peer}/chain", timeout=peer_timeout)
+        response.raise_for_status()
+        chain_dump = response.json()['chain']
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        peers.record_failure(peer)
+        return None
+    if not isinstance(chain_dump, list) or not all(valid_block_data(b) for b in chain_dump):
+        peers.record_failure(peer)
+        return None
+    peers.record_success(peer, time.time() - start)
+    return chain_dump
 
-# Load peers from file
-if os.path.exists(peers_file):
-    with open(peers_file, 'r') as f:
-        peers = set(json.load(f))
-else:
-    peers = set()
+def sync_with_peers():
+    # Consensus: adopt the longest valid chain among the fastest healthy peers
+    candidates = peers.best_peers(sync_peers)
+    if not candidates:
+        return False
+    with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+        chain_dumps = list(zip(candidates, executor.map(fetch_chain, candidates)))
+    chain_dumps = sorted(((peer, d) for peer, d in chain_dumps if d), key=lambda c: len(c[1]), reverse=True)
+    for peer, chain_dump in chain_dumps:
+        if len(chain_dump) <= len(blockchain.chain):
+            break
+        try:
+            chain = create_chain_from_dump(chain_dump)
+            if blockchain.check_chain_validity(chain) and blockchain.replace_chain(chain):
+                return True
+        except Exception:
+            # A chain that breaks adoption counts against the peer that served it
+            peers.record_failure(peer)
+    return False
+
+def announce_block(peer, block_data):
+    start = time.time()
+    try:
+        requests.post(f"{peer}/add_block", json=block_data, timeout=peer_timeout)
+    except requests.RequestException:
+        peers.record_failure(peer)
+        return
+    peers.record_success(peer, time.time() - start)
+
+def announce_new_block(block):
+    block_data = dict(block.__dict__)
+    for peer in peers.best_peers(broadcast_fanout):
+        threading.Thread(target=announce_block, args=(peer, block_data)).start()
 
 # Endpoint to add a new transaction
 @app.route('/new_transaction', methods=['POST'])
 def new_transaction():
+    if role == 'reader':
+        return forward_to_writer('/new_transaction')
+
     tx_data = request.get_json()
     required_fields = ["sender", "receiver", "amount", "sender_public_key", "signature"]
 
     for field in required_fields:
         if not tx_data.get(field):
             return "Invalid transaction data", 404
+    # Per-sender sequence number, starting at 0, protects against replays
+    if not isinstance(tx_data.get("sequence"), int) or isinstance(tx_data["sequence"], bool):
+        return "Invalid transaction data", 404
 
     transaction = {
         "data": {
             "sender": tx_data["sender"],
             "receiver": tx_data["receiver"],
-            "amount": tx_data["amount"]
+            "amount": tx_data["amount"],
+            "sequence": tx_data["sequence"]
         },
         "sender_public_key": tx_data["sender_public_key"],
         "signature": tx_data["signature"]
     }
 
-    if blockchain.add_new_transaction(transaction):
+    # Intake calls are short, so they are profiled in batches
+    with profiler.scope('intake', batched=True):
+        accepted = blockchain.add_new_transaction(transaction)
+    if accepted:
         return "Success", 201
     else:
-        return "Transaction verification failed", 400
+        return "Transaction rejected: bad signature, replay or insufficient balance", 400
 
 # Endpoint to mine new blocks
 @app.route('/mine', methods=['GET'])
 def mine_unconfirmed_transactions():
-    result = blockchain.mine()
-    if not result:
+    if role == 'reader':
+        return forward_to_writer('/mine')
+
+    # Optional reward address; with it a block can be mined even with an empty mempool
+    with profiler.scope('mine'):
+        new_block = blockchain.mine(request.args.get('miner'))
+        if new_block and role == 'writer':
+            store.publish(blockchain)
+    if not new_block:
         return "No transactions to mine or maximum supply reached"
-    return f"Block #{result} is mined."
+    announce_new_block(new_block)
+    return f"Block #{new_block.index} is mined."
 
 # Endpoint to view the blockchain
 @app.route('/chain', methods=['GET'])
 def get_chain():
+    if role == 'reader':
+        chain_response = store.chain_response()
+        if chain_response is None:
+            return "Chain state not available yet", 503
+        return chain_response
+
     chain_data = []
     for block in blockchain.chain:
         chain_data.append(block.__dict__)
@@ -208,15 +556,142 @@ def get_chain():
 # Endpoint to add new peers
 @app.route('/register_node', methods=['POST'])
 def register_new_peers():
+    if role == 'reader':
+        return forward_to_writer('/register_node')
+
     node_address = request.get_json()["node_address"]
     if not node_address:
         return "Invalid data", 400
 
     peers.add(node_address)
-    with open(peers_file, 'w') as f:
-        json.dump(list(peers), f)
-    
     return get_chain()
 
+# Endpoint to receive a block mined by a peer
+@app.route('/add_block', methods=['POST'])
+def verify_and_add_block():
+    if role == 'reader':
+        return forward_to_writer('/add_block')
+
+    block_data = request.get_json()
+    if not valid_block_data(block_data):
+        return "Invalid block data", 400
+
+    with profiler.scope('sync'):
+        block = create_chain_from_dump([block_data])[0]
+        proof = block_data["hash"]
+        delattr(block, 'hash')
+        added = blockchain.add_remote_block(block, proof)
+        if added and role == 'writer':
+            store.publish(blockchain)
+    if not added:
+        return "The block was discarded by the node", 400
+    return "Block added to the chain", 201
+
+# Endpoint to sync the chain with the fastest healthy peers
+@app.route('/sync', methods=['GET'])
+def sync_chain():
+    if role == 'reader':
+        return forward_to_writer('/sync')
+
+    with profiler.scope('sync'):
+        replaced = sync_with_peers()
+        if replaced and role == 'writer':
+            store.publish(blockchain)
+    return jsonify(replaced=replaced, length=len(blockchain.chain))
+
+# Admin endpoint to control the profiler: GET shows its status and the profiles written,
+# POST {"scopes": [...], "window": seconds, "interval_ms": 5, "batch_size": 100} starts a
+# sampling window, DELETE stops it and writes any pending batch.
+# Restricted to local requests or the X-Admin-Token header (HQ_ADMIN_TOKEN)
+@app.route('/admin/profile', methods=['GET', 'POST', 'DELETE'])
+def admin_profile():
+    if not is_admin_request():
+        return "Forbidden", 403
+    if role == 'reader':
+        return forward_to_writer('/admin/profile')
+
+    if request.method == 'POST':
+        profile_data = request.get_json(silent=True)
+        if not isinstance(profile_data, dict):
+            return "Invalid profile data", 400
+        scopes = profile_data.get("scopes")
+        if (not isinstance(scopes, list) or not scopes or
+                not all(scope in profile_scopes for scope in scopes)):
+            return f"scopes must be a non-empty list of {', '.join(profile_scopes)}", 400
+        window = profile_data.get("window", 60)
+        interval_ms = profile_data.get("interval_ms")
+        batch_size = profile_data.get("batch_size")
+        if not positive_number(window):
+            return "window must be a positive number", 400
+        if interval_ms is not None and not positive_number(interval_ms):
+            return "interval_ms must be a positive number", 400
+        if batch_size is not None and (isinstance(batch_size, bool) or
+                                       not isinstance(batch_size, int) or batch_size <= 0):
+            return "batch_size must be a positive integer", 400
+        profiler.enable(scopes,
+                        window=window,
+                        interval=interval_ms / 1000 if interval_ms else None,
+                        batch_size=batch_size)
+    elif request.method == 'DELETE':
+        profiler.disable()
+    return jsonify(profiler.status())
+
+# Endpoint to list peers and their health
+@app.route('/peers', methods=['GET'])
+def get_peers():
+    if role == 'reader':
+        return forward_to_writer('/peers')
+
+    return jsonify(peers=peers.best_peers())
+
+# Endpoint to look up a single block
+@app.route('/block/<int:index>', methods=['GET'])
+def get_block(index):
+    if role == 'reader':
+        block_data = store.get_block(index)
+    elif 0 <= index < len(blockchain.chain):
+        block_data = blockchain.chain[index].__dict__
+    else:
+        block_data = None
+    if block_data is None:
+        return "Block not found", 404
+    return json.dumps(block_data)
+
+# Endpoint to look up the balance of a wallet address
+@app.route('/balance/<address>', methods=['GET'])
+def get_balance(address):
+    if role == 'reader':
+        balance = store.get_balance(address)
+        if balance is None:
+            return "Chain state not available yet", 503
+        sequence = store.get_sequence(address)
+    else:
+        balance = blockchain.balances.get(address, 0)
+        sequence = blockchain.sequences.get(address, 0)
+    # sequence is the next confirmed sequence number expected from this address
+    return jsonify(address=address, balance=balance, sequence=sequence)
+
+# Endpoint to add stake
+@app.route('/add_stake', methods=['POST'])
+def add_stake():
+    if role == 'reader':
+        return forward_to_writer('/add_stake')
+
+    stake_data = request.get_json()
+    required_fields = ["stakeholder", "amount"]
+
+    for field in required_fields:
+        if not stake_data.get(field):
+            return "Invalid stake data", 404
+
+    blockchain.add_stake(stake_data["stakeholder"], stake_data["amount"])
+    if role == 'writer':
+        store.publish(blockchain)
+    return "Success", 201
+
 if __name__ == '__main__':
-    app.run(debug=True, port=8000)
+    if role == 'writer':
+        # A single-threaded owner process serializes every write
+        app.run(port=int(os.environ.get('HQ_PORT', 8000)), threaded=False)
+    else:
+        app.run(debug=True, port=8000)
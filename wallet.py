@@ -11,10 +11,17 @@ def generate_keys():
     public_key = private_key.get_verifying_key()
     public_key_bytes = public_key.to_string()
 
+    return {
+        'private_key': private_key_bytes.hex(),
+        'public_key': public_key_bytes.hex(),
+        'wallet_address': public_key_to_address(public_key_bytes)
+    }
+
+def public_key_to_address(public_key_bytes):
     # Generar la dirección de la wallet
     # 1. Aplicar SHA-256 a la clave pública
     sha256_pk = hashlib.sha256(public_key_bytes).digest()
-    
+
     # 2. Aplicar RIPEMD-160 a la salida de SHA-256
     ripemd160 = hashlib.new('ripemd160')
     ripemd160.update(sha256_pk)
@@ -34,16 +41,11 @@ def generate_keys():
     binary_address = versioned_payload + checksum
 
     # 7. Codificar en Base58
-    wallet_address = base58.b58encode(binary_address).decode('utf-8')
-
-    return {
-        'private_key': private_key_bytes.hex(),
-        'public_key': public_key_bytes.hex(),
-        'wallet_address': wallet_address
-    }
-
-# Generar las claves
-keys = generate_keys()
-print(f"Private Key: {keys['private_key']}")
-print(f"Public Key: {keys['public_key']}")
-print(f"Wallet Address: {keys['wallet_address']}")
+    return base58.b58encode(binary_address).decode('utf-8')
+
+if __name__ == '__main__':
+    # Generar las claves
+    keys = generate_keys()
+    print(f"Private Key: {keys['private_key']}")
+    print(f"Public Key: {keys['public_key']}")
+    print(f"Wallet Address: {keys['wallet_address']}")